@@ -0,0 +1,77 @@
+"""
+Compare hashing a payload file once per digest against digesting it in a
+single pass with :class:`johnhancock.PayloadDigester`.
+
+    PYTHONPATH=. python benchmarks/bench_digest.py --size 256 --digests md5 crc32c
+
+"""
+import os
+import time
+import argparse
+import tempfile
+
+import johnhancock
+from johnhancock import DIGESTS, PayloadDigester
+
+
+def separate_passes(path, algorithms, block_size):
+    for algorithm in ['sha256'] + list(algorithms):
+        h = DIGESTS[algorithm][0]()
+        with open(path, 'rb', buffering=0) as fh:
+            while True:
+                block = fh.read(block_size)
+                if not block:
+                    break
+                h.update(block)
+
+
+def single_pass(path, algorithms, block_size):
+    with open(path, 'rb', buffering=0) as fh:
+        PayloadDigester.from_file(fh, algorithms, block_size)
+
+
+def best_of(func, repeat, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--size', type=int, default=64, help='payload MiB')
+    parser.add_argument('--block-size', type=int, default=1024 * 1024)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument(
+        '--digests', nargs='*', default=['md5', 'crc32'],
+        choices=sorted(set(DIGESTS) - {'sha256'}),
+    )
+    args = parser.parse_args()
+    if 'crc32c' in args.digests and johnhancock._crc32c is None:
+        print('Note: the crc32c package is not installed; using the '
+              'pure-Python CRC32C.')
+
+    with tempfile.NamedTemporaryFile() as fh:
+        for _ in range(args.size):
+            fh.write(os.urandom(1024 * 1024))
+        fh.flush()
+        digests = ['sha256'] + args.digests
+        print('{} MiB payload, digests: {}'.format(
+            args.size, ', '.join(digests),
+        ))
+        for name, func in [
+                ('separate passes', separate_passes),
+                ('single pass', single_pass),
+        ]:
+            elapsed = best_of(
+                func, args.repeat, fh.name, args.digests, args.block_size,
+            )
+            print('{:>16}: {:8.3f} s  {:8.1f} MiB/s'.format(
+                name, elapsed, args.size / elapsed,
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Measure signing throughput end to end against the local mock server in
+:mod:`johnhancock.mockserver`, which verifies every signature.
+
+The server runs in a separate process.  Each concurrent client keeps one
+connection open and signs each request just before sending it.
+
+    PYTHONPATH=. python benchmarks/loadgen.py --requests 2000 \\
+        --concurrency 1 8 32 --modes headers query chunked
+
+"""
+import time
+import asyncio
+import argparse
+import multiprocessing
+from urllib.parse import urlencode
+
+from johnhancock import Credentials, CanonicalRequest, ChunkedEncoder
+from johnhancock.mockserver import MockServer
+
+
+KEY_ID = 'AKIDEXAMPLE'
+SECRET = 'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY'
+
+
+def serve(conn):
+    server = MockServer({KEY_ID: SECRET})
+
+    async def run():
+        s = await server.start()
+        conn.send(server.port)
+        async with s:
+            await s.serve_forever()
+
+    asyncio.run(run())
+
+
+async def send(reader, writer, method, target, headers, body):
+    """
+    Send a request and read the response.  Returns the status code.
+
+    """
+    head = '{} {} HTTP/1.1\r\n{}Content-Length: {}\r\n\r\n'.format(
+        method,
+        target,
+        ''.join('{}: {}\r\n'.format(*header) for header in headers),
+        len(body),
+    )
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':')[1])
+    await reader.readexactly(length)
+    return status
+
+
+def sign_headers(credentials, url, body):
+    request = CanonicalRequest('PUT', url, payload=body)
+    headers = list(request.headers.items())
+    headers += credentials.sign_via_headers(request)
+    return 'PUT', request._parts.path, headers, body
+
+
+def sign_query(credentials, url, body):
+    request = CanonicalRequest('GET', url)
+    signature = credentials.sign_via_query_string(request)[-1]
+    target = request._parts.path + '?' + urlencode(
+        request.query + [signature]
+    )
+    return 'GET', target, list(request.headers.items()), b''
+
+
+def sign_chunked(credentials, url, body):
+    request = CanonicalRequest('PUT', url)
+    encoder = ChunkedEncoder(credentials, request, [body], chunk_size=8192)
+    extra = encoder.sign_via_headers()
+    headers = list(request.headers.items()) + extra[-1:]
+    return 'PUT', request._parts.path, headers, b''.join(encoder)
+
+
+MODES = {
+    'headers': sign_headers,
+    'query': sign_query,
+    'chunked': sign_chunked,
+}
+
+
+async def worker(port, credentials, sign, count, body, stats):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    url = 'http://127.0.0.1:{}/bench/object'.format(port)
+    for _ in range(count):
+        start = time.perf_counter()
+        method, target, headers, data = sign(credentials, url, body)
+        signed = time.perf_counter()
+        status = await send(reader, writer, method, target, headers, data)
+        end = time.perf_counter()
+        stats['sign'].append(signed - start)
+        stats['latency'].append(end - start)
+        if status != 200:
+            stats['errors'] += 1
+    writer.close()
+
+
+async def run(port, mode, concurrency, requests, body):
+    credentials = Credentials(KEY_ID, SECRET, 'us-east-1', 's3')
+    # Make sure the object fetched by presigned requests exists.
+    await worker(port, credentials, sign_headers, 1, body, {
+        'sign': [], 'latency': [], 'errors': 0,
+    })
+    stats = {'sign': [], 'latency': [], 'errors': 0}
+    start = time.perf_counter()
+    # Hand out the remainder so that every request is sent.
+    counts = [
+        requests // concurrency + (i < requests % concurrency)
+        for i in range(concurrency)
+    ]
+    await asyncio.gather(*[
+        worker(port, credentials, MODES[mode], count, body, stats)
+        for count in counts if count
+    ])
+    return time.perf_counter() - start, stats
+
+
+def percentile(values, p):
+    return values[int(round(p / 100 * (len(values) - 1)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument(
+        '--concurrency', type=int, nargs='+', default=[1, 8, 32],
+    )
+    parser.add_argument(
+        '--modes', nargs='+', choices=sorted(MODES), default=sorted(MODES),
+    )
+    parser.add_argument('--size', type=int, default=1024, help='body bytes')
+    args = parser.parse_args()
+    if args.requests < 1 or min(args.concurrency) < 1:
+        parser.error('--requests and --concurrency must be at least 1')
+
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=serve, args=(child,), daemon=True)
+    server.start()
+    port = parent.recv()
+    body = b'x' * args.size
+
+    print('{:>8} {:>5} {:>9} {:>8} {:>8} {:>8} {:>9} {:>6}'.format(
+        'mode', 'conc', 'req/s', 'p50 ms', 'p90 ms', 'p99 ms', 'sign us',
+        'errors',
+    ))
+    try:
+        for mode in args.modes:
+            for concurrency in args.concurrency:
+                elapsed, stats = asyncio.run(
+                    run(port, mode, concurrency, args.requests, body)
+                )
+                latency = sorted(stats['latency'])
+                print(
+                    '{:>8} {:>5} {:>9.0f} {:>8.2f} {:>8.2f} {:>8.2f} '
+                    '{:>9.1f} {:>6}'.format(
+                        mode,
+                        concurrency,
+                        len(latency) / elapsed,
+                        percentile(latency, 50) * 1000,
+                        percentile(latency, 90) * 1000,
+                        percentile(latency, 99) * 1000,
+                        sum(stats['sign']) / len(stats['sign']) * 1e6,
+                        stats['errors'],
+                    )
+                )
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
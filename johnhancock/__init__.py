@@ -1,12 +1,34 @@
+import io
+import os
 import re
+import base64
 import hashlib
 import hmac
-import binascii
-from datetime import datetime as DateTime
+import mmap
+import struct
+import zlib
+import tempfile
+import multiprocessing
+from datetime import (
+    datetime as DateTime, timedelta as TimeDelta, timezone,
+)
+from email.utils import parsedate_to_datetime
 from urllib.parse import urlsplit, parse_qsl, urlencode
 from collections import namedtuple
 from collections.abc import MutableMapping, Mapping
 
+try:
+    from crc32c import crc32c as _crc32c
+except ImportError:  # pragma: no cover
+    _crc32c = None
+
+try:
+    from cryptography.hazmat.primitives import (
+        hashes as _hashes, hmac as _crypto_hmac,
+    )
+except ImportError:  # pragma: no cover
+    _hashes = _crypto_hmac = None
+
 
 class Headers(MutableMapping):
     """
@@ -35,6 +57,477 @@ class Headers(MutableMapping):
         return len(self._map)
 
 
+class HashlibBackend(object):
+    """
+    The default crypto backend, using the standard library.
+
+    """
+    name = 'hashlib'
+
+    def sha256(self, data=b''):
+        """
+        Return a SHA-256 hash object, with the :mod:`hashlib` interface.
+
+        """
+        return hashlib.sha256(data)
+
+    def hmac(self, key, msg):
+        """
+        Compute an HMAC-SHA256 digest in one shot.
+
+        """
+        return hmac.digest(key, msg, 'sha256')
+
+    def hmac_signer(self, key):
+        """
+        Return a function which computes HMAC-SHA256 digests with the given
+        key.  The keyed HMAC state is computed once and copied for each
+        message.
+
+        """
+        base = hmac.new(key, digestmod=hashlib.sha256)
+
+        def sign(msg):
+            h = base.copy()
+            h.update(msg)
+            return h.digest()
+        return sign
+
+
+class _CryptographyHash(object):
+    """
+    Wraps a hash from the ``cryptography`` package with the :mod:`hashlib`
+    interface.
+
+    """
+    def __init__(self, h):
+        self._h = h
+
+    def update(self, data):
+        self._h.update(data)
+
+    def copy(self):
+        return _CryptographyHash(self._h.copy())
+
+    def digest(self):
+        return self._h.copy().finalize()
+
+    def hexdigest(self):
+        return self.digest().hex()
+
+
+class CryptographyBackend(object):
+    """
+    A crypto backend using the ``cryptography`` package, which must be
+    installed.
+
+    """
+    name = 'cryptography'
+
+    def __init__(self):
+        if _hashes is None:
+            raise ImportError('The cryptography package is not installed.')
+
+    def sha256(self, data=b''):
+        h = _CryptographyHash(_hashes.Hash(_hashes.SHA256()))
+        if data:
+            h.update(data)
+        return h
+
+    def hmac(self, key, msg):
+        h = _crypto_hmac.HMAC(key, _hashes.SHA256())
+        h.update(msg)
+        return h.finalize()
+
+    def hmac_signer(self, key):
+        state = _crypto_hmac.HMAC(key, _hashes.SHA256())
+
+        def sign(msg):
+            h = state.copy()
+            h.update(msg)
+            return h.finalize()
+        return sign
+
+
+#: The available crypto backends, by name.
+BACKENDS = {
+    'hashlib': HashlibBackend,
+    'cryptography': CryptographyBackend,
+}
+
+_backends = {}
+_default_backend = 'hashlib'
+
+
+def get_backend(name=None):
+    """
+    Return a crypto backend.
+
+    :param name:  The name of the backend, from :data:`BACKENDS`.  Defaults
+        to the default backend.
+    :type name:  str
+
+    :raises ImportError:  If the backend's library is not installed.
+
+    """
+    name = name or _default_backend
+    try:
+        return _backends[name]
+    except KeyError:
+        backend = _backends[name] = BACKENDS[name]()
+        return backend
+
+
+def set_default_backend(name):
+    """
+    Set the crypto backend used when none is given.
+
+    :param name:  The name of the backend, from :data:`BACKENDS`.
+    :type name:  str
+
+    :raises ImportError:  If the backend's library is not installed.
+
+    """
+    global _default_backend
+    get_backend(name)
+    _default_backend = name
+
+
+def _make_crc32c_table():
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x82F63B78 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_CRC32C_TABLE = _make_crc32c_table()
+
+
+def crc32c(data, value=0):
+    """
+    Compute the CRC32C (Castagnoli) checksum of the data, continuing from
+    ``value``.  Uses the ``crc32c`` package if it is installed, otherwise a
+    much slower pure-Python implementation.
+
+    """
+    if _crc32c is not None:
+        return _crc32c(data, value)
+    table = _CRC32C_TABLE
+    crc = value ^ 0xFFFFFFFF
+    for byte in data:
+        crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+
+class _CRC(object):
+    """
+    A CRC checksum with the same interface as the :mod:`hashlib` objects.
+
+    """
+    def __init__(self, func):
+        self._func = func
+        self._value = 0
+
+    def update(self, data):
+        self._value = self._func(data, self._value)
+
+    def digest(self):
+        return struct.pack('>I', self._value)
+
+    def hexdigest(self):
+        return self.digest().hex()
+
+
+#: The supported digests, and the header each is sent in.
+DIGESTS = {
+    'sha256': (hashlib.sha256, None),
+    'md5': (hashlib.md5, 'Content-MD5'),
+    'sha1': (hashlib.sha1, 'X-Amz-Checksum-SHA1'),
+    'crc32': (lambda: _CRC(zlib.crc32), 'X-Amz-Checksum-CRC32'),
+    'crc32c': (lambda: _CRC(crc32c), 'X-Amz-Checksum-CRC32C'),
+}
+
+#: The checksum headers that may trail an ``aws-chunked`` body, and the
+#: digest each is computed with.
+TRAILERS = {
+    header.lower(): algorithm
+    for algorithm, (_, header) in DIGESTS.items()
+    if header is not None and header.lower().startswith('x-amz-checksum-')
+}
+
+
+class PayloadDigester(object):
+    """
+    Computes several digests of a payload in a single pass.  Assign it to
+    :attr:`CanonicalRequest.payload` to set the payload hash and the headers
+    for each digest.
+
+    :param algorithms:  The digests to compute, from :data:`DIGESTS`.  The
+        SHA-256 digest is always computed.
+    :type algorithms:  iterable of str
+
+    """
+    #: The default block size when reading from a file.
+    block_size = 1024 * 1024
+
+    def __init__(self, algorithms=()):
+        self._hashes = {'sha256': get_backend().sha256()}
+        for algorithm in algorithms:
+            if algorithm not in DIGESTS:
+                raise ValueError('Unknown digest {!r}.'.format(algorithm))
+            self._hashes.setdefault(algorithm, DIGESTS[algorithm][0]())
+        self._updates = [h.update for h in self._hashes.values()]
+
+    @classmethod
+    def from_file(cls, fileobj, algorithms=(), block_size=None):
+        """
+        Digest the contents of a file.
+
+        :param fileobj:  A file opened in binary mode.
+        :type fileobj:  file-like object
+        :param algorithms:  The digests to compute.
+        :type algorithms:  iterable of str
+        :param block_size:  The number of bytes to read at once.
+        :type block_size:  int
+
+        """
+        digester = cls(algorithms)
+        buf = bytearray(block_size or cls.block_size)
+        view = memoryview(buf)
+        while True:
+            size = fileobj.readinto(buf)
+            if not size:
+                break
+            digester.update(view[:size])
+        return digester
+
+    def update(self, data):
+        """
+        Add a block of the payload to every digest.
+
+        """
+        for update in self._updates:
+            update(data)
+
+    def digest(self, algorithm):
+        return self._hashes[algorithm].digest()
+
+    def hexdigest(self, algorithm):
+        return self._hashes[algorithm].hexdigest()
+
+    def headers(self):
+        """
+        The headers for each digest, apart from SHA-256.
+
+        :rtype:  list of two-tuples
+
+        """
+        headers = []
+        for algorithm, h in self._hashes.items():
+            header = DIGESTS[algorithm][1]
+            if header is not None:
+                value = base64.b64encode(h.digest()).decode('ascii')
+                headers.append((header, value))
+        return headers
+
+
+class _PositionalReader(io.RawIOBase):
+    """
+    A raw binary file which reads with :func:`os.pread`, so several readers
+    of the same file each keep their own position.
+
+    :param fileno:  The file descriptor to read, which is duplicated.
+    :type fileno:  int
+    :param length:  The length of the file in bytes.
+    :type length:  int
+
+    """
+    def __init__(self, fileno, length):
+        self._fd = os.dup(fileno)
+        self._length = length
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        if self.closed:
+            raise ValueError('I/O operation on closed file.')
+        with memoryview(b) as view:
+            size = min(len(view), max(self._length - self._position, 0))
+            data = os.pread(self._fd, size, self._position)
+            view[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if self.closed:
+            raise ValueError('I/O operation on closed file.')
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._length
+        if offset < 0:
+            raise ValueError('Negative seek position {}.'.format(offset))
+        self._position = offset
+        return offset
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            os.close(self._fd)
+        super().close()
+
+
+class SpooledPayload(object):
+    """
+    Reads a body which cannot be rewound, such as a generator or a socket,
+    digesting it as it is read.  Small bodies are kept in memory and larger
+    ones are spilled to a temporary file, so the body can be sent after the
+    request is signed without holding all of it in memory.  Assign it to
+    :attr:`CanonicalRequest.payload` to set the payload hash.
+
+    :param body:  The body, as a binary file or an iterable of bytes.
+    :type body:  file-like object or iterable
+    :param threshold:  The number of bytes to keep in memory.
+    :type threshold:  int
+    :param algorithms:  Additional digests to compute.  See
+        :class:`PayloadDigester`.
+    :type algorithms:  iterable of str
+    :param block_size:  The number of bytes to read at once.
+    :type block_size:  int
+
+    """
+    #: The length of the body in bytes.
+    length = 0
+
+    _mmap = None
+
+    def __init__(
+            self,
+            body,
+            threshold=1024 * 1024,
+            algorithms=(),
+            block_size=64 * 1024,
+    ):
+        self.digester = PayloadDigester(algorithms)
+        self._threshold = threshold
+        self._block_size = block_size
+        self._buffer = io.BytesIO()
+        self._file = None
+        if hasattr(body, 'readinto'):
+            buf = bytearray(block_size)
+            view = memoryview(buf)
+            while True:
+                size = body.readinto(buf)
+                if not size:
+                    break
+                self._write(view[:size])
+        elif hasattr(body, 'read'):
+            for data in iter(lambda: body.read(block_size), b''):
+                self._write(data)
+        else:
+            for data in body:
+                self._write(data)
+        if self._file is None:
+            self._data = self._buffer.getvalue()
+            self._view = memoryview(self._data)
+        else:
+            self._file.flush()
+            self._mmap = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ,
+            )
+            self._view = memoryview(self._mmap)
+        self._buffer = None
+
+    def _write(self, data):
+        self.digester.update(data)
+        self.length += len(data)
+        if self._file is None and self.length > self._threshold:
+            self._file = tempfile.TemporaryFile()
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        (self._file or self._buffer).write(data)
+
+    @property
+    def spilled(self):
+        """
+        Whether the body was spilled to a temporary file.
+
+        """
+        return self._file is not None
+
+    def _check_open(self):
+        if self._view is None:
+            raise ValueError('The payload is closed.')
+
+    def getbuffer(self):
+        """
+        Return a read-only view of the body, without copying it.  A spilled
+        body is mapped into memory from its temporary file.
+
+        :rtype:  :class:`memoryview`
+
+        """
+        self._check_open()
+        return self._view
+
+    def open(self):
+        """
+        Return a new binary file of the body, at the start.  Each file has
+        its own position, and closing it does not affect the payload.
+
+        """
+        self._check_open()
+        if not self.spilled:
+            return io.BytesIO(self._data)
+        return io.BufferedReader(
+            _PositionalReader(self._file.fileno(), self.length),
+            self._block_size,
+        )
+
+    def __iter__(self):
+        self._check_open()
+        view = self._view
+        for i in range(0, self.length, self._block_size):
+            yield view[i:i + self._block_size]
+
+    def __len__(self):
+        return self.length
+
+    def close(self):
+        """
+        Discard the body, removing the temporary file if any.
+
+        """
+        if self._view is None:
+            return
+        self._view = None
+        self._data = None
+        if self._file is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Views of the body are still alive, so the mapping is left
+                # to be freed once they are released.
+                pass
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
 class CanonicalRequest(object):
     """
     An object representing an HTTP request to be made to AWS.
@@ -49,8 +542,9 @@ class CanonicalRequest(object):
     :type query:  str or dict or list of two-tuples
     :param headers:  A dictionary of headers.
     :type headers:  dict
-    :param payload:  The request body.
-    :type payload:  bytes-like object
+    :param payload:  The request body, or a digest of it.
+    :type payload:  bytes-like object, :class:`PayloadDigester` or
+        :class:`SpooledPayload`
 
     """
     def __init__(
@@ -86,7 +580,7 @@ class CanonicalRequest(object):
 
     @property
     def hashed(self):
-        return hashlib.sha256(str(self).encode('ascii')).hexdigest()
+        return get_backend().sha256(str(self).encode('ascii')).hexdigest()
 
     @property
     def payload(self):
@@ -94,7 +588,14 @@ class CanonicalRequest(object):
 
     @payload.setter
     def payload(self, value):
-        self.hashed_payload = hashlib.sha256(value).hexdigest()
+        if isinstance(value, SpooledPayload):
+            value = value.digester
+        if isinstance(value, PayloadDigester):
+            self.hashed_payload = value.hexdigest('sha256')
+            for header, digest in value.headers():
+                self.headers[header] = digest
+        else:
+            self.hashed_payload = get_backend().sha256(value).hexdigest()
 
     @property
     def canonical_headers(self):
@@ -138,32 +639,46 @@ class CanonicalRequest(object):
             '%Y%m%dT%H%M%SZ',
         )
 
-    def set_date_header(self):
+    def set_date_header(self, offset=None, replace=False):
         """
         Set the ``X-Amz-Date`` header to the current datetime, if not set.
 
+        :param offset:  A correction to apply to the local clock.
+        :type offset:  :class:`datetime.timedelta`
+        :param replace:  Whether to replace an existing header.
+        :type replace:  bool
+
         :returns:  The datetime from the ``X-Amz-Date`` header.
         :rtype:  :class:`datetime.datetime`
 
         """
-        if 'x-amz-date' not in self.headers:
-            datetime = self._datetime().strftime('%Y%m%dT%H%M%SZ')
+        if replace or 'x-amz-date' not in self.headers:
+            datetime = self._datetime()
+            if offset:
+                datetime += offset
+            datetime = datetime.strftime('%Y%m%dT%H%M%SZ')
             self.headers['x-amz-date'] = datetime
             return datetime
         else:
             return None
 
-    def set_date_param(self):
+    def set_date_param(self, offset=None):
         """
         Set the ``X-Amz-Date`` query parameter to the current datetime, if not
         set.
 
+        :param offset:  A correction to apply to the local clock.
+        :type offset:  :class:`datetime.timedelta`
+
         :returns:  The datetime from the ``X-Amz-Date`` parameter.
         :rtype:  :class:`datetime.datetime`
 
         """
         if not any(key == 'X-Amz-Date' for (key, _) in self.query):
-            datetime = self._datetime().strftime('%Y%m%dT%H%M%SZ')
+            datetime = self._datetime()
+            if offset:
+                datetime += offset
+            datetime = datetime.strftime('%Y%m%dT%H%M%SZ')
             self.query.append(
                 ('X-Amz-Date', datetime)
             )
@@ -243,31 +758,50 @@ class SigningKey(object):
     :type secret:  str
     :param scope:  The credential scope with date.
     :type scope:  :class:`DatedCredentialScope`
+    :param backend:  The crypto backend.  Defaults to the default backend.
+    :type backend:  :class:`HashlibBackend` or :class:`CryptographyBackend`
 
     """
     #: The computed signing key as a bytes object
     key = None
 
-    def __init__(self, secret, scope):
+    _signer = None
+
+    def __init__(self, secret, scope, backend=None):
+        self._backend = backend or get_backend()
         date = scope.date.strftime('%Y%m%d')
         signed_date = self._sign(b'AWS4' + secret.encode('ascii'), date)
         signed_region = self._sign(signed_date, scope.region)
         signed_service = self._sign(signed_region, scope.service)
         self.key = self._sign(signed_service, 'aws4_request')
 
+    @classmethod
+    def from_key(cls, key, backend=None):
+        """
+        Create a signing key from an already computed key.
+
+        :param key:  The computed signing key.
+        :type key:  bytes
+        :param backend:  The crypto backend.
+        :type backend:  :class:`HashlibBackend` or :class:`CryptographyBackend`
+
+        """
+        signing_key = cls.__new__(cls)
+        signing_key._backend = backend or get_backend()
+        signing_key.key = bytes(key)
+        return signing_key
+
     def _sign(self, key, value):
-        return hmac.new(
-            key,
-            value.encode('ascii'),
-            hashlib.sha256,
-        ).digest()
+        return self._backend.hmac(key, value.encode('ascii'))
 
     def sign(self, string):
         """
         Sign a string.  Returns the hexidecimal digest.
 
         """
-        return binascii.hexlify(self._sign(self.key, string)).decode('ascii')
+        if self._signer is None:
+            self._signer = self._backend.hmac_signer(self.key)
+        return self._signer(string.encode('ascii')).hex()
 
 
 def generate_string_to_sign(date, scope, request):
@@ -292,41 +826,230 @@ def generate_string_to_sign(date, scope, request):
     ])
 
 
-class Credentials(object):
+#: The payload hash of a signed aws-chunked upload.
+STREAMING_PAYLOAD = 'STREAMING-AWS4-HMAC-SHA256-PAYLOAD'
+
+#: The payload hash of a signed aws-chunked upload with trailing headers.
+STREAMING_PAYLOAD_TRAILER = 'STREAMING-AWS4-HMAC-SHA256-PAYLOAD-TRAILER'
+
+#: The payload hash of an unsigned aws-chunked upload with trailing headers.
+STREAMING_UNSIGNED_PAYLOAD_TRAILER = 'STREAMING-UNSIGNED-PAYLOAD-TRAILER'
+
+#: The SHA-256 hash of an empty string.
+EMPTY_SHA256 = (
+    'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855'
+)
+
+
+def generate_chunk_string_to_sign(date, scope, previous, chunk_hash):
     """
-    An object that encapsulates all the necessary credentials to sign a
-    request.
+    Generate the string to be signed for a chunk of an aws-chunked upload.
+
+    :param date:  The datetime of the request.
+    :type date:  :class:`datetime.datetime`
+    :param scope:  The credential scope.
+    :type scope:  :class:`CredentialScope` or :class:`DatedCredentialScope`
+    :param previous:  The signature of the previous chunk, or of the request
+        for the first chunk.
+    :type previous:  str
+    :param chunk_hash:  The hexadecimal SHA-256 hash of the chunk.
+    :type chunk_hash:  str
+
+    """
+    if isinstance(scope, CredentialScope):
+        scope = scope.date(date)
+    return '\n'.join([
+        'AWS4-HMAC-SHA256-PAYLOAD',
+        date.strftime('%Y%m%dT%H%M%SZ'),
+        str(scope),
+        previous,
+        EMPTY_SHA256,
+        chunk_hash,
+    ])
+
+
+def generate_trailer_string_to_sign(date, scope, previous, trailer_hash):
+    """
+    Generate the string to be signed for the trailing headers of an
+    aws-chunked upload.
+
+    :param date:  The datetime of the request.
+    :type date:  :class:`datetime.datetime`
+    :param scope:  The credential scope.
+    :type scope:  :class:`CredentialScope` or :class:`DatedCredentialScope`
+    :param previous:  The signature of the final chunk.
+    :type previous:  str
+    :param trailer_hash:  The hexadecimal SHA-256 hash of the trailing
+        headers, each formatted as ``name:value\\n``.
+    :type trailer_hash:  str
+
+    """
+    if isinstance(scope, CredentialScope):
+        scope = scope.date(date)
+    return '\n'.join([
+        'AWS4-HMAC-SHA256-TRAILER',
+        date.strftime('%Y%m%dT%H%M%SZ'),
+        str(scope),
+        previous,
+        trailer_hash,
+    ])
+
+
+#: The query parameters added when signing via the query string.
+_QUERY_SIGNING_PARAMS = frozenset([
+    'X-Amz-Algorithm', 'X-Amz-Credential', 'X-Amz-Date', 'X-Amz-Expires',
+    'X-Amz-SignedHeaders', 'X-Amz-Signature',
+])
+
 
+class Signer(object):
     """
-    def __init__(self, key_id, key_secret, region, service):
+    An object that signs requests for any region and service with a single
+    key pair.  The signing key for every scope seen is cached and shared
+    between all requests.
+
+    :param key_id:  The AWS key ID.
+    :type key_id:  str
+    :param key_secret:  The AWS key secret.
+    :type key_secret:  str
+    :param key_store:  A store of derived keys to share with other processes.
+    :type key_store:  :class:`SharedKeyStore`
+
+    """
+    #: The correction applied to the local clock when dating requests.
+    clock_offset = TimeDelta(0)
+
+    # The newest date a key has been derived for.
+    _newest = ''
+
+    def __init__(self, key_id, key_secret, key_store=None):
         self._key_id = key_id
         self._key_secret = key_secret
-        self._scope = CredentialScope(region, service)
+        self._key_store = key_store
+        self._keys = {}
 
-    def scope(self, datetime):
-        return self._scope.date(datetime)
+    def _datetime(self):
+        """
+        Return the current UTC datetime.
 
-    def signing_key(self, datetime):
-        return SigningKey(self._key_secret, self.scope(datetime))
+        """
+        return DateTime.utcnow()
 
-    def sign_via_headers(self, request):
+    def now(self):
+        """
+        Return the current UTC datetime, corrected by :attr:`clock_offset`.
+
+        """
+        return self._datetime() + self.clock_offset
+
+    def scope(self, datetime, region, service):
+        return DatedCredentialScope(region, service, datetime)
+
+    def signing_key(self, datetime, region, service):
+        cache_key = (datetime.strftime('%Y%m%d'), region, service)
+        try:
+            return self._keys[cache_key]
+        except KeyError:
+            pass
+        # Keys more than a day older than the newest date are of no further
+        # use, so drop them as soon as a new day is seen.
+        if cache_key[0] > self._newest:
+            self._newest = cache_key[0]
+            self._prune(datetime)
+        scope = self.scope(datetime, region, service)
+        if self._key_store is not None:
+            key = self._key_store.signing_key(self._key_secret, scope)
+        else:
+            key = SigningKey(self._key_secret, scope)
+        self._keys[cache_key] = key
+        return key
+
+    def _prune(self, date):
+        """
+        Drop cached keys more than a day older than the given date.
+
+        """
+        oldest = (date - TimeDelta(days=1)).strftime('%Y%m%d')
+        for cache_key in list(self._keys):
+            if cache_key[0] < oldest:
+                self._keys.pop(cache_key, None)
+
+    def warm(self, scopes=None, date=None):
+        """
+        Derive the signing keys for a day ahead of time, and drop keys more
+        than a day older.  Intended to be called shortly before midnight UTC.
+
+        :param scopes:  The scopes to derive keys for.  Defaults to every
+            scope this signer has seen.
+        :type scopes:  iterable of :class:`CredentialScope`
+        :param date:  The date to derive keys for.  Defaults to tomorrow.
+        :type date:  :class:`datetime.date`
+
+        """
+        if date is None:
+            date = (self.now() + TimeDelta(days=1)).date()
+        if scopes is None:
+            scopes = {
+                CredentialScope(region, service)
+                for (_, region, service) in self._keys
+            }
+        for scope in scopes:
+            self.signing_key(date, scope.region, scope.service)
+        self._prune(date)
+
+    def correct_clock(self, server_time):
+        """
+        Correct the local clock to agree with the server, such as after a
+        ``RequestTimeTooSkewed`` error.  The correction is applied to all
+        requests dated by this signer from then on.
+
+        :param server_time:  The server's time, as a ``Date`` header or a
+            UTC datetime.
+        :type server_time:  str or :class:`datetime.datetime`
+
+        :returns:  The new clock offset.
+        :rtype:  :class:`datetime.timedelta`
+
+        """
+        if isinstance(server_time, str):
+            server_time = parsedate_to_datetime(server_time)
+        if server_time.tzinfo is not None:
+            server_time = server_time.astimezone(timezone.utc).replace(
+                tzinfo=None,
+            )
+        self.clock_offset = server_time - self._datetime()
+        return self.clock_offset
+
+    def credentials(self, region, service):
+        """
+        Create a :class:`Credentials` bound to a region and service, which
+        shares this signer's cached keys.
+
+        """
+        return Credentials.from_signer(self, region, service)
+
+    def sign_via_headers(self, request, region, service):
         """
         Generate the appropriate headers to sign the request
 
         :param request:  The request to sign.
         :type request:  :class:`CanonicalRequest`
+        :param region:  The region the request is querying.
+        :type region:  str
+        :param service:  The service the request is querying.
+        :type service:  str
 
         :returns:  A list of additional headers.
         :rtype:  list of two-tuples
 
         """
         headers = []
-        datetime_str = request.set_date_header()
+        datetime_str = request.set_date_header(self.clock_offset)
         if datetime_str is not None:
             headers.append(('X-Amz-Date', datetime_str))
         datetime = request.datetime
-        scope = self.scope(datetime)
-        key = self.signing_key(datetime)
+        scope = self.scope(datetime, region, service)
+        key = self.signing_key(datetime, region, service)
         to_sign = generate_string_to_sign(datetime, scope, request)
         auth = 'AWS4-HMAC-SHA256 ' + ', '.join([
             'Credential={}/{}'.format(self._key_id, str(scope)),
@@ -336,25 +1059,30 @@ class Credentials(object):
         headers.append(('Authorization', auth))
         return headers
 
-    def sign_via_query_string(self, request, expires=60):
+    def sign_via_query_string(self, request, region, service, expires=60):
         """
-        Create a :clas:`SignedRequest` from the given request by adding the
-        appropriate query parameters.
-
-        :param credentials:  The credentials with which to sign the request.
-        :type credentials: :class:`Client`
+        Generate the appropriate query parameters to sign the request.
 
-        :returns:  The signed request.
-        :rtype:  :class:`SignedRequest`
+        :param request:  The request to sign.
+        :type request:  :class:`CanonicalRequest`
+        :param region:  The region the request is querying.
+        :type region:  str
+        :param service:  The service the request is querying.
+        :type service:  str
+        :param expires:  The lifetime of the signature in seconds.
+        :type expires:  int
+
+        :returns:  A list of additional query parameters.
+        :rtype:  list of two-tuples
 
         """
         params = []
-        datetime_str = request.set_date_param()
+        datetime_str = request.set_date_param(self.clock_offset)
         if datetime_str is not None:
             params.append(('X-Amz-Date', datetime_str))
         datetime = request.datetime
-        scope = self.scope(datetime)
-        key = self.signing_key(datetime)
+        scope = self.scope(datetime, region, service)
+        key = self.signing_key(datetime, region, service)
         to_append = [
             ('X-Amz-Algorithm', 'AWS4-HMAC-SHA256'),
             ('X-Amz-Credential', '{}/{}'.format(self._key_id, str(scope))),
@@ -368,3 +1096,671 @@ class Credentials(object):
             ('X-Amz-Signature', key.sign(to_sign))
         )
         return params
+
+    def resign_via_headers(self, request, region, service):
+        """
+        Sign a previously signed request again with the current datetime, such
+        as when retrying.  The payload hash and the other headers are reused,
+        so the payload need not be hashed again.
+
+        :param request:  The request to sign.
+        :type request:  :class:`CanonicalRequest`
+        :param region:  The region the request is querying.
+        :type region:  str
+        :param service:  The service the request is querying.
+        :type service:  str
+
+        :returns:  A list of headers to replace the previous ones.
+        :rtype:  list of two-tuples
+
+        """
+        request.headers.pop('authorization', None)
+        datetime_str = request.set_date_header(self.clock_offset, replace=True)
+        return [('X-Amz-Date', datetime_str)] + self.sign_via_headers(
+            request, region, service,
+        )
+
+    def resign_via_query_string(self, request, region, service, expires=60):
+        """
+        Sign a previously signed request again with the current datetime, such
+        as when retrying.  The payload hash and the headers are reused.
+
+        :param request:  The request to sign.
+        :type request:  :class:`CanonicalRequest`
+        :param region:  The region the request is querying.
+        :type region:  str
+        :param service:  The service the request is querying.
+        :type service:  str
+        :param expires:  The lifetime of the signature in seconds.
+        :type expires:  int
+
+        :returns:  A list of query parameters to replace the previous ones.
+        :rtype:  list of two-tuples
+
+        """
+        request.query = [
+            (key, value) for (key, value) in request.query
+            if key not in _QUERY_SIGNING_PARAMS
+        ]
+        return self.sign_via_query_string(
+            request, region, service, expires=expires,
+        )
+
+
+class Credentials(object):
+    """
+    An object that encapsulates all the necessary credentials to sign a
+    request.
+
+    :param key_store:  A store of derived keys to share with other processes.
+    :type key_store:  :class:`SharedKeyStore`
+
+    """
+    def __init__(self, key_id, key_secret, region, service, key_store=None):
+        self._signer = Signer(key_id, key_secret, key_store)
+        self._scope = CredentialScope(region, service)
+
+    @classmethod
+    def from_signer(cls, signer, region, service):
+        """
+        Create credentials from an existing :class:`Signer`.
+
+        """
+        credentials = cls.__new__(cls)
+        credentials._signer = signer
+        credentials._scope = CredentialScope(region, service)
+        return credentials
+
+    def now(self):
+        """
+        Return the current UTC datetime, corrected by the clock offset.  See
+        :meth:`Signer.now`.
+
+        """
+        return self._signer.now()
+
+    def scope(self, datetime):
+        return self._scope.date(datetime)
+
+    def signing_key(self, datetime):
+        return self._signer.signing_key(datetime, *self._scope)
+
+    def sign_via_headers(self, request):
+        """
+        Generate the appropriate headers to sign the request
+
+        :param request:  The request to sign.
+        :type request:  :class:`CanonicalRequest`
+
+        :returns:  A list of additional headers.
+        :rtype:  list of two-tuples
+
+        """
+        return self._signer.sign_via_headers(request, *self._scope)
+
+    def sign_via_query_string(self, request, expires=60):
+        """
+        Generate the appropriate query parameters to sign the request.
+
+        :param request:  The request to sign.
+        :type request:  :class:`CanonicalRequest`
+        :param expires:  The lifetime of the signature in seconds.
+        :type expires:  int
+
+        :returns:  A list of additional query parameters.
+        :rtype:  list of two-tuples
+
+        """
+        return self._signer.sign_via_query_string(
+            request, *self._scope, expires=expires
+        )
+
+    def resign_via_headers(self, request):
+        """
+        Sign a previously signed request again with the current datetime.  See
+        :meth:`Signer.resign_via_headers`.
+
+        """
+        return self._signer.resign_via_headers(request, *self._scope)
+
+    def resign_via_query_string(self, request, expires=60):
+        """
+        Sign a previously signed request again with the current datetime.  See
+        :meth:`Signer.resign_via_query_string`.
+
+        """
+        return self._signer.resign_via_query_string(
+            request, *self._scope, expires=expires
+        )
+
+    def correct_clock(self, server_time):
+        """
+        Correct the local clock to agree with the server.  See
+        :meth:`Signer.correct_clock`.
+
+        """
+        return self._signer.correct_clock(server_time)
+
+
+class PresignedCache(object):
+    """
+    A cache of presigned query strings.  Repeated requests for the same
+    resource will reuse a previously generated signature for as long as enough
+    of its lifetime remains.
+
+    :param credentials:  The credentials with which to sign requests.
+    :type credentials:  :class:`Credentials`
+    :param max_size:  The maximum number of signatures to hold.
+    :type max_size:  int
+    :param min_remaining:  The fraction of ``expires`` which must remain on a
+        cached signature for it to be reused.
+    :type min_remaining:  float
+
+    """
+    #: The number of requests served from the cache.
+    hits = 0
+
+    #: The number of requests which had to be signed.
+    misses = 0
+
+    #: The number of signatures dropped to make room for new ones.
+    evictions = 0
+
+    def __init__(self, credentials, max_size=1024, min_remaining=0.5):
+        self._credentials = credentials
+        self._max_size = max_size
+        self._min_remaining = min_remaining
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _datetime(self):
+        """
+        Return the current UTC datetime, corrected by the credentials' clock
+        offset so it agrees with the dates on the signatures.
+
+        """
+        return self._credentials.now()
+
+    def _key(self, request, expires):
+        """
+        Generate the cache key for a request.  Everything that contributes to
+        the signature, except for the date, is included.
+
+        """
+        return (
+            request.method,
+            request._parts[:3],
+            urlencode(request.query),
+            request.canonical_headers,
+            request.hashed_payload,
+            expires,
+        )
+
+    def _threshold(self, expires):
+        return TimeDelta(seconds=expires * self._min_remaining)
+
+    @property
+    def hit_rate(self):
+        """
+        The fraction of requests served from the cache.
+
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def sign_via_query_string(self, request, expires=60):
+        """
+        Sign the request as with :meth:`Credentials.sign_via_query_string`,
+        reusing a cached signature if possible.
+
+        :param request:  The request to sign.
+        :type request:  :class:`CanonicalRequest`
+        :param expires:  The lifetime of the signature in seconds.
+        :type expires:  int
+
+        :returns:  A list of additional query parameters.
+        :rtype:  list of two-tuples
+
+        """
+        now = self._datetime()
+        key = self._key(request, expires)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, query, params = entry
+            if expires_at - now >= self._threshold(expires):
+                self.hits += 1
+                request.query = list(query)
+                return list(params)
+            self._entries.pop(key, None)
+        self.misses += 1
+        params = self._credentials.sign_via_query_string(request, expires)
+        expires_at = request.datetime + TimeDelta(seconds=expires)
+        if len(self._entries) >= self._max_size:
+            self._evict(now)
+        self._entries[key] = (expires_at, list(request.query), list(params))
+        return params
+
+    def _evict(self, now):
+        """
+        Make room for a new entry.  Drops every entry which can no longer be
+        served, or failing that the entry with the least lifetime remaining.
+
+        """
+        entries = list(self._entries.items())
+        stale = [
+            key for key, (expires_at, _, _) in entries
+            if expires_at - now < self._threshold(key[-1])
+        ]
+        if not stale and entries:
+            stale = [min(entries, key=lambda x: x[1][0])[0]]
+        for key in stale:
+            self._entries.pop(key, None)
+        self.evictions += len(stale)
+
+    def clear(self):
+        """
+        Drop all cached signatures.
+
+        """
+        self._entries.clear()
+
+
+class SharedKeyStore(object):
+    """
+    A store of derived signing keys, shared between processes.
+
+    The store lives in anonymous shared memory, so it must be created before
+    forking and it is never backed by a file.  Only derived keys are stored;
+    each is tagged with a fingerprint of the secret it came from, so keys from
+    a rotated secret are never returned.  The secret itself never enters the
+    store.
+
+    Reads take no lock.  Each slot carries a sequence number which writers
+    make odd while they are writing, and readers treat a torn read as a miss.
+    Writers give up after :attr:`lock_timeout`, so a process killed while
+    holding the lock cannot stall the others; keys are then derived locally.
+
+    :param slots:  The number of keys the store can hold.
+    :type slots:  int
+
+    """
+    # sequence, date, secret fingerprint, scope, key
+    _slot = struct.Struct('<QI16s96s32s')
+    _seq = struct.Struct('<Q')
+
+    #: The number of slots probed for a given scope.
+    probe = 8
+
+    #: How long, in seconds, a writer waits for the lock before giving up.
+    lock_timeout = 0.1
+
+    def __init__(self, slots=256):
+        self._slots = slots
+        self._mmap = mmap.mmap(-1, slots * self._slot.size)
+        self._lock = multiprocessing.Lock()
+        self._fingerprints = {}
+
+    def _datetime(self):
+        """
+        Return the current UTC datetime.
+
+        """
+        return DateTime.utcnow()
+
+    def _fingerprint(self, secret):
+        try:
+            return self._fingerprints[secret]
+        except KeyError:
+            fingerprint = hmac.new(
+                b'AWS4' + secret.encode('ascii'),
+                b'johnhancock key store',
+                hashlib.sha256,
+            ).digest()[:16]
+            self._fingerprints[secret] = fingerprint
+            return fingerprint
+
+    def _locate(self, fingerprint, scope):
+        """
+        Return the offsets of the slots that may hold the given scope.
+
+        """
+        start = zlib.crc32(fingerprint + scope)
+        return [
+            ((start + i) % self._slots) * self._slot.size
+            for i in range(min(self.probe, self._slots))
+        ]
+
+    def _read(self, offset):
+        """
+        Read a slot.  Returns ``None`` if it is being written.
+
+        """
+        seq, date, fingerprint, scope, key = self._slot.unpack_from(
+            self._mmap, offset,
+        )
+        if seq % 2 or self._seq.unpack_from(self._mmap, offset)[0] != seq:
+            return None
+        return seq, date, fingerprint, scope, key
+
+    def _write(self, offset, date, fingerprint, scope, key):
+        seq = self._seq.unpack_from(self._mmap, offset)[0]
+        # An odd sequence number is left by a writer that died mid-write.
+        seq += seq % 2
+        self._seq.pack_into(self._mmap, offset, seq + 1)
+        self._slot.pack_into(
+            self._mmap, offset, seq + 1, date, fingerprint, scope, key,
+        )
+        self._seq.pack_into(self._mmap, offset, seq + 2)
+
+    def _encode(self, scope):
+        encoded = str(scope).encode('ascii')
+        if len(encoded) > 96:
+            raise ValueError('Credential scope is too long to store.')
+        return int(scope.date.strftime('%Y%m%d')), encoded.ljust(96, b'\0')
+
+    def get(self, secret, scope):
+        """
+        Retrieve a signing key from the store.
+
+        :param secret:  The AWS key secret.
+        :type secret:  str
+        :param scope:  The credential scope with date.
+        :type scope:  :class:`DatedCredentialScope`
+
+        :returns:  The signing key, or ``None`` if it is not in the store.
+        :rtype:  :class:`SigningKey`
+
+        """
+        fingerprint = self._fingerprint(secret)
+        _, encoded = self._encode(scope)
+        for offset in self._locate(fingerprint, encoded):
+            slot = self._read(offset)
+            if slot is not None and slot[2:4] == (fingerprint, encoded):
+                return SigningKey.from_key(slot[4])
+        return None
+
+    def put(self, secret, scope, key):
+        """
+        Add a signing key to the store.  If there is no room, the key with
+        the oldest date is replaced.
+
+        :param secret:  The AWS key secret.
+        :type secret:  str
+        :param scope:  The credential scope with date.
+        :type scope:  :class:`DatedCredentialScope`
+        :param key:  The signing key derived from the secret and scope.
+        :type key:  :class:`SigningKey`
+
+        :returns:  Whether the key was stored.  It is not if the lock could
+            not be acquired within :attr:`lock_timeout`.
+        :rtype:  bool
+
+        """
+        fingerprint = self._fingerprint(secret)
+        date, encoded = self._encode(scope)
+        if not self._lock.acquire(timeout=self.lock_timeout):
+            return False
+        try:
+            offsets = self._locate(fingerprint, encoded)
+            slots = [
+                self._slot.unpack_from(self._mmap, offset)
+                for offset in offsets
+            ]
+            for offset, slot in zip(offsets, slots):
+                if slot[2:4] == (fingerprint, encoded) or not slot[1]:
+                    break
+            else:
+                offset = min(
+                    zip(offsets, slots), key=lambda x: x[1][1],
+                )[0]
+            self._write(offset, date, fingerprint, encoded, key.key)
+        finally:
+            self._lock.release()
+        return True
+
+    def signing_key(self, secret, scope):
+        """
+        Retrieve a signing key from the store, deriving and storing it if it
+        is missing.
+
+        :param secret:  The AWS key secret.
+        :type secret:  str
+        :param scope:  The credential scope with date.
+        :type scope:  :class:`DatedCredentialScope`
+
+        :rtype:  :class:`SigningKey`
+
+        """
+        key = self.get(secret, scope)
+        if key is None:
+            key = SigningKey(secret, scope)
+            self.put(secret, scope, key)
+        return key
+
+    def prefetch(self, secret, scopes, date=None):
+        """
+        Derive and store the signing keys for a day, so that no process need
+        derive them itself at day rollover.
+
+        :param secret:  The AWS key secret.
+        :type secret:  str
+        :param scopes:  The scopes to derive keys for.
+        :type scopes:  iterable of :class:`CredentialScope`
+        :param date:  The date to derive keys for.  Defaults to tomorrow.
+        :type date:  :class:`datetime.date`
+
+        """
+        if date is None:
+            date = (self._datetime() + TimeDelta(days=1)).date()
+        for scope in scopes:
+            scope = scope.date(date)
+            if self.get(secret, scope) is None:
+                self.put(secret, scope, SigningKey(secret, scope))
+
+    def purge(self, before):
+        """
+        Erase all keys dated before the given date.
+
+        :param before:  The earliest date to keep.
+        :type before:  :class:`datetime.date`
+
+        :returns:  Whether the keys were erased.  They are not if the lock
+            could not be acquired within :attr:`lock_timeout`.
+        :rtype:  bool
+
+        """
+        before = int(before.strftime('%Y%m%d'))
+        empty = (0, b'', b'', b'')
+        if not self._lock.acquire(timeout=self.lock_timeout):
+            return False
+        try:
+            for i in range(self._slots):
+                offset = i * self._slot.size
+                date = self._slot.unpack_from(self._mmap, offset)[1]
+                if date and date < before:
+                    self._write(offset, *empty)
+        finally:
+            self._lock.release()
+        return True
+
+
+class ChunkedEncoder(object):
+    """
+    Encodes a body of unknown length for an aws-chunked upload, optionally
+    with a trailing checksum.  Only one chunk of the body is held in memory
+    at a time.
+
+    Call :meth:`sign_via_headers` to sign the request, then iterate over the
+    encoder for the encoded body.
+
+    :param credentials:  The credentials with which to sign the request.
+    :type credentials:  :class:`Credentials`
+    :param request:  The request to sign.
+    :type request:  :class:`CanonicalRequest`
+    :param body:  The body, as a binary file or an iterable of bytes.
+    :type body:  file-like object or iterable
+    :param chunk_size:  The size of each chunk, except the last.
+    :type chunk_size:  int
+    :param checksum:  The digest to send as a trailing header, one of those
+        in :data:`TRAILERS`, or ``None`` for no trailer.  ``crc32c`` is only fast
+        with the optional ``crc32c`` package installed.
+    :type checksum:  str
+    :param signed:  Whether to sign each chunk.  Unsigned uploads must have a
+        trailing checksum.
+    :type signed:  bool
+    :param decoded_length:  The length of the body, if known.
+    :type decoded_length:  int
+
+    """
+    def __init__(
+            self,
+            credentials,
+            request,
+            body,
+            chunk_size=64 * 1024,
+            checksum='crc32',
+            signed=True,
+            decoded_length=None,
+    ):
+        if checksum is not None and checksum not in TRAILERS.values():
+            raise ValueError(
+                'Unsupported trailing checksum {!r}.'.format(checksum)
+            )
+        if not signed and checksum is None:
+            raise ValueError('Unsigned uploads require a trailing checksum.')
+        self._credentials = credentials
+        self._request = request
+        self._body = body
+        self._chunk_size = chunk_size
+        self._checksum = checksum
+        self._signed = signed
+        self._decoded_length = decoded_length
+        self._signature = None
+
+    def sign_via_headers(self):
+        """
+        Set the aws-chunked headers on the request and sign it.
+
+        :returns:  A list of additional headers.
+        :rtype:  list of two-tuples
+
+        """
+        request = self._request
+        request.headers['Content-Encoding'] = 'aws-chunked'
+        if self._decoded_length is not None:
+            request.headers['X-Amz-Decoded-Content-Length'] = str(
+                self._decoded_length
+            )
+        if self._checksum is None:
+            request.hashed_payload = STREAMING_PAYLOAD
+        else:
+            request.headers['X-Amz-Trailer'] = self._trailer_name
+            if self._signed:
+                request.hashed_payload = STREAMING_PAYLOAD_TRAILER
+            else:
+                request.hashed_payload = STREAMING_UNSIGNED_PAYLOAD_TRAILER
+        request.headers['X-Amz-Content-SHA256'] = request.hashed_payload
+        headers = self._credentials.sign_via_headers(request)
+        auth = dict(headers)['Authorization']
+        self._signature = auth.rsplit('Signature=', 1)[1]
+        self._date = request.datetime
+        self._scope = self._credentials.scope(self._date)
+        self._key = self._credentials.signing_key(self._date)
+        return headers
+
+    @property
+    def _trailer_name(self):
+        return DIGESTS[self._checksum][1].lower()
+
+    def _chunks(self):
+        """
+        Split the body into chunks of ``chunk_size``.  Chunks read from a
+        file are views of a reused buffer, valid until the next is read.
+
+        """
+        size = self._chunk_size
+        if hasattr(self._body, 'readinto'):
+            view = memoryview(bytearray(size))
+            while True:
+                filled = 0
+                while filled < size:
+                    read = self._body.readinto(view[filled:])
+                    if not read:
+                        break
+                    filled += read
+                if filled:
+                    yield view[:filled]
+                if filled < size:
+                    return
+        elif hasattr(self._body, 'read'):
+            while True:
+                chunk = bytearray()
+                while len(chunk) < size:
+                    more = self._body.read(size - len(chunk))
+                    if not more:
+                        break
+                    chunk += more
+                if chunk:
+                    yield chunk
+                if len(chunk) < size:
+                    return
+        else:
+            buf = bytearray()
+            for data in self._body:
+                buf += data
+                while len(buf) >= size:
+                    yield bytes(buf[:size])
+                    del buf[:size]
+            if buf:
+                yield bytes(buf)
+
+    def _encode(self, chunk):
+        if self._signed:
+            to_sign = generate_chunk_string_to_sign(
+                self._date,
+                self._scope,
+                self._signature,
+                get_backend().sha256(chunk).hexdigest(),
+            )
+            self._signature = self._key.sign(to_sign)
+            head = '{:x};chunk-signature={}\r\n'.format(
+                len(chunk), self._signature,
+            )
+        else:
+            head = '{:x}\r\n'.format(len(chunk))
+        return head.encode('ascii') + chunk + b'\r\n'
+
+    def _trailer(self, digest):
+        value = base64.b64encode(digest.digest()).decode('ascii')
+        trailer = '{}:{}'.format(self._trailer_name, value)
+        if self._signed:
+            to_sign = generate_trailer_string_to_sign(
+                self._date,
+                self._scope,
+                self._signature,
+                get_backend().sha256(
+                    (trailer + '\n').encode('ascii')
+                ).hexdigest(),
+            )
+            self._signature = self._key.sign(to_sign)
+            trailer += '\r\nx-amz-trailer-signature:' + self._signature
+        return (trailer + '\r\n\r\n').encode('ascii')
+
+    def __iter__(self):
+        if self._signature is None:
+            raise ValueError('The request must be signed first.')
+        digest = None
+        if self._checksum is not None:
+            digest = DIGESTS[self._checksum][0]()
+        for chunk in self._chunks():
+            if digest is not None:
+                digest.update(chunk)
+            yield self._encode(chunk)
+        final = self._encode(b'')
+        if digest is None:
+            yield final
+        else:
+            # The final chunk's trailing CRLF is replaced by the trailer.
+            yield final[:-2] + self._trailer(digest)
@@ -0,0 +1,468 @@
+"""
+A local S3-like HTTP server which verifies requests signed with Signature
+Version 4, for end-to-end and load testing without network access.
+
+Signatures are checked with johnhancock's own canonicalization, for requests
+signed via headers, via the query string, and for aws-chunked bodies.
+Objects are kept in memory.  To run it standalone::
+
+    python -m johnhancock.mockserver --port 8000 AKIDEXAMPLE:secret
+
+"""
+import re
+import hmac
+import base64
+import asyncio
+import hashlib
+import argparse
+from datetime import datetime as DateTime, timedelta as TimeDelta
+from email.utils import formatdate
+from urllib.parse import urlsplit, parse_qsl
+
+from johnhancock import (
+    CanonicalRequest, Signer, DIGESTS, TRAILERS, STREAMING_PAYLOAD,
+    STREAMING_PAYLOAD_TRAILER, STREAMING_UNSIGNED_PAYLOAD_TRAILER,
+    generate_string_to_sign, generate_chunk_string_to_sign,
+    generate_trailer_string_to_sign,
+)
+
+
+_AUTH_RE = re.compile(
+    r'AWS4-HMAC-SHA256 Credential=([^,]+), ?SignedHeaders=([^,]+), ?'
+    + r'Signature=([0-9a-f]+)$'
+)
+
+
+class RequestError(Exception):
+    """
+    A request which the server rejected.
+
+    :param status:  The HTTP status code.
+    :type status:  int
+    :param code:  The S3 error code, such as ``SignatureDoesNotMatch``.
+    :type code:  str
+    :param message:  A description of the error.
+    :type message:  str
+
+    """
+    def __init__(self, status, code, message):
+        super(RequestError, self).__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+def _signature_mismatch(what='request'):
+    return RequestError(
+        403,
+        'SignatureDoesNotMatch',
+        'The {} signature we calculated does not match the signature you '
+        'provided.'.format(what),
+    )
+
+
+class MockServer(object):
+    """
+    A server which verifies signed requests and stores objects in memory.
+
+    :param keys:  The secret for each key ID.
+    :type keys:  dict
+    :param max_skew:  How far a request's date may be from the server's.
+    :type max_skew:  :class:`datetime.timedelta`
+
+    """
+    #: The number of requests handled.
+    requests = 0
+
+    #: The number of requests rejected.
+    rejected = 0
+
+    def __init__(self, keys, max_skew=TimeDelta(minutes=15)):
+        self._signers = {
+            key_id: Signer(key_id, secret) for key_id, secret in keys.items()
+        }
+        self._max_skew = max_skew
+        self.objects = {}
+
+    def _datetime(self):
+        """
+        Return the current UTC datetime.
+
+        """
+        return DateTime.utcnow()
+
+    def _parse_credential(self, credential):
+        """
+        Split a credential into the signer and the scope.
+
+        """
+        try:
+            key_id, date, region, service, terminator = credential.split('/')
+        except ValueError:
+            raise RequestError(400, 'AuthorizationHeaderMalformed',
+                               'Malformed credential.')
+        if terminator != 'aws4_request' or not credential.isascii():
+            raise RequestError(400, 'AuthorizationHeaderMalformed',
+                               'Malformed credential.')
+        try:
+            signer = self._signers[key_id]
+        except KeyError:
+            raise RequestError(403, 'InvalidAccessKeyId',
+                               'The access key ID does not exist.')
+        return signer, date, region, service
+
+    def _check_date(self, datetime, date):
+        if datetime.strftime('%Y%m%d') != date:
+            raise RequestError(400, 'AuthorizationHeaderMalformed',
+                               'The credential date does not match.')
+        if abs(self._datetime() - datetime) > self._max_skew:
+            raise RequestError(
+                403,
+                'RequestTimeTooSkewed',
+                'The difference between the request time and the current '
+                'time is too large.',
+            )
+
+    def verify(self, method, target, headers, body):
+        """
+        Verify the signature of a request.
+
+        :param method:  The HTTP method.
+        :type method:  str
+        :param target:  The request target, the path and query string.
+        :type target:  str
+        :param headers:  The request headers, with lowercase names.
+        :type headers:  dict
+        :param body:  The request body.
+        :type body:  bytes
+
+        :returns:  The request body, decoded if it is aws-chunked.
+        :rtype:  bytes
+
+        :raises RequestError:  If the request is rejected.
+
+        """
+        parts = urlsplit(target)
+        query = parse_qsl(parts.query)
+        params = dict(query)
+        presigned = 'X-Amz-Signature' in params
+        if presigned:
+            if params.get('X-Amz-Algorithm') != 'AWS4-HMAC-SHA256':
+                raise RequestError(400, 'AuthorizationQueryParametersError',
+                                   'Unsupported algorithm.')
+            try:
+                credential = params['X-Amz-Credential']
+                signed_headers = params['X-Amz-SignedHeaders']
+                signature = params['X-Amz-Signature']
+                expires = int(params['X-Amz-Expires'])
+            except (KeyError, ValueError):
+                raise RequestError(400, 'AuthorizationQueryParametersError',
+                                   'Missing or malformed parameters.')
+            query = [(k, v) for (k, v) in query if k != 'X-Amz-Signature']
+        else:
+            match = _AUTH_RE.match(headers.get('authorization', ''))
+            if match is None:
+                raise RequestError(403, 'AccessDenied', 'Access Denied')
+            credential, signed_headers, signature = match.groups()
+        signer, date, region, service = self._parse_credential(credential)
+
+        try:
+            request = CanonicalRequest(
+                method,
+                parts.path,
+                query,
+                {
+                    name: headers[name]
+                    for name in signed_headers.split(';')
+                },
+            )
+            datetime = request.datetime
+        except KeyError as e:
+            raise RequestError(403, 'AccessDenied',
+                               'Signed header {} is missing.'.format(e))
+        except ValueError:
+            raise RequestError(403, 'AccessDenied', 'Malformed date.')
+        if presigned:
+            if datetime.strftime('%Y%m%d') != date:
+                raise RequestError(400, 'AuthorizationQueryParametersError',
+                                   'The credential date does not match.')
+            now = self._datetime()
+            if now > datetime + TimeDelta(seconds=expires):
+                raise RequestError(403, 'AccessDenied', 'Request has expired')
+            if datetime - now > self._max_skew:
+                raise RequestError(403, 'AccessDenied',
+                                   'Request is not yet valid')
+        else:
+            self._check_date(datetime, date)
+
+        content_sha256 = headers.get('x-amz-content-sha256')
+        streaming = content_sha256 in (
+            STREAMING_PAYLOAD,
+            STREAMING_PAYLOAD_TRAILER,
+            STREAMING_UNSIGNED_PAYLOAD_TRAILER,
+        )
+        if streaming or content_sha256 == 'UNSIGNED-PAYLOAD':
+            request.hashed_payload = content_sha256
+        else:
+            request.payload = body
+            if content_sha256 not in (None, request.hashed_payload):
+                raise RequestError(
+                    400,
+                    'XAmzContentSHA256Mismatch',
+                    'The provided x-amz-content-sha256 header does not match '
+                    'what was computed.',
+                )
+
+        scope = signer.scope(datetime, region, service)
+        key = signer.signing_key(datetime, region, service)
+        try:
+            to_sign = generate_string_to_sign(datetime, scope, request)
+        except UnicodeError:
+            # Signed header values can only be signed if they are ASCII.
+            raise _signature_mismatch()
+        if not hmac.compare_digest(
+                key.sign(to_sign).encode('ascii'), signature.encode('utf-8'),
+        ):
+            raise _signature_mismatch()
+
+        if streaming:
+            body = self._decode_chunked(
+                body, headers, content_sha256, key, datetime, scope, signature,
+            )
+        return body
+
+    def _decode_chunked(
+            self, body, headers, content_sha256, key, datetime, scope,
+            signature,
+    ):
+        """
+        Decode and verify an aws-chunked body.
+
+        """
+        signed = content_sha256 != STREAMING_UNSIGNED_PAYLOAD_TRAILER
+        trailer = headers.get('x-amz-trailer')
+        if trailer is not None and trailer not in TRAILERS:
+            raise RequestError(400, 'InvalidRequest',
+                               'Unsupported x-amz-trailer.')
+        if content_sha256 != STREAMING_PAYLOAD and trailer is None:
+            raise RequestError(400, 'InvalidRequest',
+                               'Missing x-amz-trailer.')
+        digest = None
+        if trailer is not None:
+            digest = DIGESTS[TRAILERS[trailer]][0]()
+
+        malformed = RequestError(400, 'IncompleteBody',
+                                 'Malformed aws-chunked body.')
+        decoded = bytearray()
+        pos = 0
+        while True:
+            end = body.find(b'\r\n', pos)
+            if end == -1:
+                raise malformed
+            try:
+                head = body[pos:end].decode('ascii')
+                size, _, extension = head.partition(';')
+                size = int(size, 16)
+            except ValueError:
+                raise malformed
+            pos = end + 2
+            if size < 0:
+                raise malformed
+            chunk = body[pos:pos + size]
+            if len(chunk) != size:
+                raise malformed
+            if signed:
+                to_sign = generate_chunk_string_to_sign(
+                    datetime,
+                    scope,
+                    signature,
+                    hashlib.sha256(chunk).hexdigest(),
+                )
+                signature = key.sign(to_sign)
+                if not hmac.compare_digest(
+                        extension, 'chunk-signature=' + signature,
+                ):
+                    raise _signature_mismatch('chunk')
+            decoded += chunk
+            if digest is not None:
+                digest.update(chunk)
+            pos += size
+            if not size:
+                break
+            if body[pos:pos + 2] != b'\r\n':
+                raise malformed
+            pos += 2
+
+        if trailer is None:
+            if body[pos:] != b'\r\n':
+                raise malformed
+        else:
+            try:
+                lines = body[pos:].decode('ascii').split('\r\n')
+            except ValueError:
+                raise malformed
+            if lines[-2:] != ['', ''] or len(lines) < 3:
+                raise malformed
+            lines = lines[:-2]
+            trailing = dict(line.partition(':')[::2] for line in lines)
+            if signed:
+                to_sign = generate_trailer_string_to_sign(
+                    datetime,
+                    scope,
+                    signature,
+                    hashlib.sha256(
+                        ''.join(
+                            line + '\n' for line in lines
+                            if not line.startswith('x-amz-trailer-signature:')
+                        ).encode('ascii')
+                    ).hexdigest(),
+                )
+                if not hmac.compare_digest(
+                        trailing.get('x-amz-trailer-signature', ''),
+                        key.sign(to_sign),
+                ):
+                    raise _signature_mismatch('trailer')
+            checksum = base64.b64encode(digest.digest()).decode('ascii')
+            if trailing.get(trailer) != checksum:
+                raise RequestError(400, 'BadDigest',
+                                   'The {} you specified did not match the '
+                                   'calculated checksum.'.format(trailer))
+
+        decoded_length = headers.get('x-amz-decoded-content-length')
+        if decoded_length is not None and decoded_length != str(len(decoded)):
+            raise RequestError(400, 'IncompleteBody',
+                               'The decoded content length does not match.')
+        return bytes(decoded)
+
+    def handle(self, method, target, headers, body):
+        """
+        Verify and act on a request.
+
+        :returns:  The status, additional headers, and body of the response.
+        :rtype:  tuple
+
+        """
+        self.requests += 1
+        try:
+            body = self.verify(method, target, headers, body)
+        except RequestError as e:
+            self.rejected += 1
+            return e.status, [('Content-Type', 'application/xml')], (
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<Error><Code>{}</Code><Message>{}</Message></Error>'.format(
+                    e.code, e.message,
+                ).encode('utf-8')
+            )
+        path = urlsplit(target).path
+        if method == 'PUT':
+            self.objects[path] = body
+            etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+            return 200, [('ETag', etag)], b''
+        elif method in ('GET', 'HEAD'):
+            try:
+                data = self.objects[path]
+            except KeyError:
+                return 404, [], b''
+            return 200, [], data if method == 'GET' else b''
+        elif method == 'DELETE':
+            self.objects.pop(path, None)
+            return 204, [], b''
+        return 405, [], b''
+
+    async def _read_body(self, reader, headers):
+        if 'chunked' in headers.get('transfer-encoding', ''):
+            body = bytearray()
+            while True:
+                line = await reader.readline()
+                size = int(line.split(b';')[0], 16)
+                if not size:
+                    # Discard any HTTP trailers.
+                    while (await reader.readline()) not in (b'\r\n', b''):
+                        pass
+                    return bytes(body)
+                body += await reader.readexactly(size)
+                await reader.readexactly(2)
+        length = int(headers.get('content-length', 0))
+        return await reader.readexactly(length)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                method, target, version = line.decode('ascii').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    name = name.strip().lower()
+                    value = value.strip()
+                    if name in headers:
+                        value = headers[name] + ',' + value
+                    headers[name] = value
+                body = await self._read_body(reader, headers)
+                status, response_headers, data = self.handle(
+                    method, target, headers, body,
+                )
+                response_headers += [
+                    ('Date', formatdate(usegmt=True)),
+                    ('Content-Length', str(len(data))),
+                ]
+                writer.write(
+                    'HTTP/1.1 {} -\r\n{}\r\n'.format(
+                        status,
+                        ''.join(
+                            '{}: {}\r\n'.format(*header)
+                            for header in response_headers
+                        ),
+                    ).encode('latin-1') + (data if method != 'HEAD' else b'')
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=0):
+        """
+        Start serving.  The port is available as :attr:`port`.
+
+        :rtype:  :class:`asyncio.Server`
+
+        """
+        server = await asyncio.start_server(
+            self._handle_connection, host, port,
+        )
+        self.port = server.sockets[0].getsockname()[1]
+        return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Run a local S3-like server which verifies signatures.',
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('keys', nargs='+', metavar='KEY_ID:SECRET')
+    args = parser.parse_args(argv)
+    server = MockServer(dict(key.split(':', 1) for key in args.keys))
+
+    async def serve():
+        s = await server.start(args.host, args.port)
+        print('Listening on {}:{}'.format(args.host, server.port))
+        async with s:
+            await s.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -4,4 +4,8 @@ setup(
     name='johnhancock',
     version='0.1.0',
     packages=find_packages(),
+    extras_require={
+        'crc32c': ['crc32c'],
+        'cryptography': ['cryptography'],
+    },
 )
@@ -1,6 +1,6 @@
 import pytest
 import textwrap
-from datetime import datetime as DateTime
+from datetime import datetime as DateTime, timedelta as TimeDelta
 
 from johnhancock import CanonicalRequest, Headers
 
@@ -281,3 +281,20 @@ def test_canon_request_datetime():
         'Action=ListUsers&Version=2010-05-08&X-Amz-Date=20150830T123700Z',
     )
     assert canon_request.datetime == DateTime(2015, 8, 30, 12, 37)
+
+
+def test_canon_request_set_date_header_offset_replace():
+    canon_request = CanonicalRequest(
+        'GET',
+        '/',
+        'Action=ListUsers&Version=2010-05-08',
+        {
+            'Host': 'iam.amazonaws.com',
+            'X-Amz-Date': '20150830T123600Z',
+        },
+    )
+    canon_request._datetime = lambda: DateTime(2015, 8, 30, 12, 37)
+    assert canon_request.set_date_header(
+        TimeDelta(minutes=-20), replace=True,
+    ) == '20150830T121700Z'
+    assert canon_request.headers['x-amz-date'] == '20150830T121700Z'
@@ -1,4 +1,6 @@
-from datetime import datetime as DateTime, date as Date
+from datetime import (
+    datetime as DateTime, date as Date, timedelta as TimeDelta,
+)
 from johnhancock import (
     Credentials, CredentialScope, CanonicalRequest, DatedCredentialScope,
     SigningKey,
@@ -106,3 +108,69 @@ def test_credentials_sign_via_params():
         'X-Amz-Signature',
         '37ac2f4fde00b0ac9bd9eadeb459b1bbee224158d66e7ae5fcadb70b2d181d02',
     )
+
+
+def test_credentials_resign_via_headers():
+    c = Credentials(
+        'AKIDEXAMPLE',
+        'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY',
+        'us-east-1',
+        'iam',
+    )
+    canon_request = CanonicalRequest(
+        'GET',
+        '/',
+        'Action=ListUsers&Version=2010-05-08',
+        {
+            'Host': 'iam.amazonaws.com',
+            'Content-Type': 'application/x-www-form-urlencoded; charset=utf-8',
+            'X-Amz-Date': '20150830T120000Z',
+        },
+    )
+    c.sign_via_headers(canon_request)
+    canon_request.headers['Authorization'] = 'stale'
+
+    # The local clock is 36 minutes slow.
+    c._signer._datetime = lambda: DateTime(2015, 8, 30, 12, 0)
+    assert c.correct_clock('Sun, 30 Aug 2015 12:36:00 GMT') == TimeDelta(
+        minutes=36,
+    )
+    canon_request._datetime = lambda: DateTime(2015, 8, 30, 12, 0)
+    headers = c.resign_via_headers(canon_request)
+    assert headers == [
+        ('X-Amz-Date', '20150830T123600Z'),
+        ('Authorization', (
+            'AWS4-HMAC-SHA256 '
+            + 'Credential=AKIDEXAMPLE/20150830/us-east-1/iam/aws4_request, '
+            + 'SignedHeaders=content-type;host;x-amz-date, '
+            + 'Signature=5d672d79c15b13162d9279b0855cfba6789a8edb4c82c400e06b'
+            + '5924a6f2b5d7'
+        )),
+    ]
+
+
+def test_credentials_resign_via_params():
+    c = Credentials(
+        'AKIDEXAMPLE',
+        'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY',
+        'us-east-1',
+        'iam',
+    )
+    canon_request = CanonicalRequest(
+        'GET',
+        '/',
+        'Action=ListUsers&Version=2010-05-08',
+        {
+            'Host': 'iam.amazonaws.com',
+            'Content-Type': 'application/x-www-form-urlencoded; charset=utf-8',
+        },
+    )
+    canon_request._datetime = lambda: DateTime(2015, 8, 30, 12, 0)
+    c.sign_via_query_string(canon_request)
+    canon_request._datetime = lambda: DateTime(2015, 8, 30, 12, 36)
+    params = c.resign_via_query_string(canon_request)
+    assert params[2] == ('X-Amz-Date', '20150830T123600Z')
+    assert params[5] == (
+        'X-Amz-Signature',
+        '37ac2f4fde00b0ac9bd9eadeb459b1bbee224158d66e7ae5fcadb70b2d181d02',
+    )
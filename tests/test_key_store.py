@@ -0,0 +1,95 @@
+import os
+import multiprocessing
+from datetime import date as Date
+
+from johnhancock import (
+    Credentials, CredentialScope, DatedCredentialScope, SigningKey,
+    SharedKeyStore,
+)
+
+
+SECRET = 'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY'
+
+
+def test_key_store_get_put():
+    store = SharedKeyStore()
+    scope = DatedCredentialScope('us-east-1', 'iam', Date(2015, 8, 30))
+    assert store.get(SECRET, scope) is None
+    store.put(SECRET, scope, SigningKey(SECRET, scope))
+    assert store.get(SECRET, scope).key == SigningKey(SECRET, scope).key
+
+    # Keys are never returned for a different secret.
+    assert store.get('rotated', scope) is None
+
+
+def test_key_store_replaces_oldest():
+    store = SharedKeyStore(slots=2)
+    scopes = [
+        DatedCredentialScope('us-east-1', 'iam', Date(2015, 8, day))
+        for day in (30, 29, 31)
+    ]
+    for scope in scopes:
+        store.signing_key(SECRET, scope)
+    assert store.get(SECRET, scopes[0]) is not None
+    assert store.get(SECRET, scopes[1]) is None
+    assert store.get(SECRET, scopes[2]) is not None
+
+    store.purge(Date(2015, 8, 31))
+    assert store.get(SECRET, scopes[0]) is None
+    assert store.get(SECRET, scopes[2]) is not None
+
+
+def _prefetch(store):
+    store.prefetch(SECRET, [CredentialScope('us-east-1', 'iam')],
+                   Date(2015, 8, 31))
+
+
+def test_key_store_shared_across_processes():
+    store = SharedKeyStore()
+    process = multiprocessing.get_context('fork').Process(
+        target=_prefetch, args=(store,),
+    )
+    process.start()
+    process.join()
+    scope = DatedCredentialScope('us-east-1', 'iam', Date(2015, 8, 31))
+    assert store.get(SECRET, scope).key == SigningKey(SECRET, scope).key
+
+
+def test_credentials_key_store():
+    store = SharedKeyStore()
+    c = Credentials('id', SECRET, 'us-east-1', 'iam', key_store=store)
+    scope = DatedCredentialScope('us-east-1', 'iam', Date(2015, 8, 30))
+    key = c.signing_key(Date(2015, 8, 30))
+    assert key.key == SigningKey(SECRET, scope).key
+    assert store.get(SECRET, scope) is not None
+
+
+def _die_holding_lock(store):
+    store._lock.acquire()
+    os._exit(0)
+
+
+def test_key_store_dead_writer():
+    store = SharedKeyStore()
+    store.lock_timeout = 0.01
+    scope = DatedCredentialScope('us-east-1', 'iam', Date(2015, 8, 30))
+    expected = SigningKey(SECRET, scope).key
+
+    # A writer is killed while holding the lock.
+    process = multiprocessing.get_context('fork').Process(
+        target=_die_holding_lock, args=(store,),
+    )
+    process.start()
+    process.join()
+    assert not store.put(SECRET, scope, SigningKey(SECRET, scope))
+    assert store.signing_key(SECRET, scope).key == expected
+    assert store.get(SECRET, scope) is None
+    assert not store.purge(Date(2015, 8, 31))
+
+    # A writer is killed mid-write, leaving the sequence number odd.
+    store._lock.release()
+    fingerprint = store._fingerprint(SECRET)
+    offset = store._locate(fingerprint, store._encode(scope)[1])[0]
+    store._seq.pack_into(store._mmap, offset, 5)
+    assert store.put(SECRET, scope, SigningKey(SECRET, scope))
+    assert store.get(SECRET, scope).key == expected
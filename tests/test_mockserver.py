@@ -0,0 +1,220 @@
+import asyncio
+from urllib.parse import urlencode
+from datetime import datetime as DateTime, timedelta as TimeDelta
+
+import pytest
+
+from johnhancock import Credentials, CanonicalRequest, ChunkedEncoder
+from johnhancock.mockserver import MockServer, RequestError
+
+
+KEY_ID = 'AKIDEXAMPLE'
+SECRET = 'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY'
+NOW = DateTime(2015, 8, 30, 12, 36)
+
+
+def make_server():
+    server = MockServer({KEY_ID: SECRET})
+    server._datetime = lambda: NOW
+    return server
+
+
+def make_request(method='GET', path='/bucket/key', payload=b''):
+    canon_request = CanonicalRequest(
+        method,
+        path,
+        'Action=ListUsers&Version=2010-05-08',
+        {'Host': 'localhost'},
+        payload,
+    )
+    canon_request._datetime = lambda: NOW
+    return canon_request
+
+
+def target(canon_request, params=()):
+    query = urlencode(list(canon_request.query) + list(params))
+    return canon_request._parts.path + '?' + query
+
+
+def test_mockserver_headers():
+    server = make_server()
+    c = Credentials(KEY_ID, SECRET, 'us-east-1', 's3')
+    canon_request = make_request('PUT', payload=b'foo')
+    headers = dict(canon_request.headers)
+    for name, value in c.sign_via_headers(canon_request):
+        headers[name.lower()] = value
+    assert server.verify(
+        'PUT', target(canon_request), headers, b'foo',
+    ) == b'foo'
+
+    with pytest.raises(RequestError) as e:
+        server.verify('PUT', target(canon_request), headers, b'bar')
+    assert e.value.code == 'SignatureDoesNotMatch'
+
+    server._datetime = lambda: NOW + TimeDelta(minutes=16)
+    with pytest.raises(RequestError) as e:
+        server.verify('PUT', target(canon_request), headers, b'foo')
+    assert e.value.code == 'RequestTimeTooSkewed'
+
+
+def test_mockserver_query_string():
+    server = make_server()
+    c = Credentials(KEY_ID, SECRET, 'us-east-1', 's3')
+    canon_request = make_request()
+    signature = c.sign_via_query_string(canon_request)[-1]
+    signed = target(canon_request, [signature])
+    headers = {'host': 'localhost'}
+    assert server.verify('GET', signed, headers, b'') == b''
+
+    server._datetime = lambda: NOW + TimeDelta(seconds=61)
+    with pytest.raises(RequestError) as e:
+        server.verify('GET', signed, headers, b'')
+    assert e.value.message == 'Request has expired'
+
+
+@pytest.mark.parametrize('checksum,signed', [
+    (None, True),
+    ('crc32c', True),
+    ('crc32', False),
+])
+def test_mockserver_chunked(checksum, signed):
+    server = make_server()
+    c = Credentials(KEY_ID, SECRET, 'us-east-1', 's3')
+    canon_request = make_request('PUT')
+    encoder = ChunkedEncoder(
+        c, canon_request, [b'foo'] * 5000, checksum=checksum, signed=signed,
+    )
+    signed_headers = encoder.sign_via_headers()
+    headers = dict(canon_request.headers)
+    for name, value in signed_headers:
+        headers[name.lower()] = value
+    body = b''.join(encoder)
+    assert server.verify(
+        'PUT', target(canon_request), headers, body,
+    ) == b'foo' * 5000
+
+    with pytest.raises(RequestError):
+        server.verify(
+            'PUT', target(canon_request), headers, body.replace(b'f', b'g'),
+        )
+
+
+def test_mockserver_http():
+    server = make_server()
+    c = Credentials(KEY_ID, SECRET, 'us-east-1', 's3')
+    canon_request = make_request('PUT')
+    encoder = ChunkedEncoder(c, canon_request, [b'foo'] * 10)
+    signed_headers = encoder.sign_via_headers()
+    headers = dict(canon_request.headers)
+    for name, value in signed_headers:
+        headers[name.lower()] = value
+    headers['transfer-encoding'] = 'chunked'
+
+    async def run():
+        s = await server.start()
+        reader, writer = await asyncio.open_connection(
+            '127.0.0.1', server.port,
+        )
+        head = 'PUT {} HTTP/1.1\r\n{}\r\n'.format(
+            target(canon_request),
+            ''.join('{}: {}\r\n'.format(*h) for h in headers.items()),
+        )
+        writer.write(head.encode('latin-1'))
+        for chunk in encoder:
+            writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        writer.write(b'0\r\n\r\n')
+        # A second request on the same connection, without a signature.
+        writer.write(b'GET /bucket/key HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        await writer.drain()
+        responses = []
+        for _ in range(2):
+            status = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line == b'\r\n':
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+            responses.append((status.split()[1], await reader.read(length)))
+        writer.close()
+        await writer.wait_closed()
+        s.close()
+        await s.wait_closed()
+        return responses
+
+    responses = asyncio.run(run())
+    assert responses[0] == (b'200', b'')
+    assert responses[1][0] == b'403'
+    assert b'<Code>AccessDenied</Code>' in responses[1][1]
+    assert server.objects['/bucket/key'] == b'foo' * 10
+    assert (server.requests, server.rejected) == (2, 1)
+
+
+@pytest.mark.parametrize('extra,body', [
+    ({'x-amz-trailer': 'x-amz-checksum-sha256'}, None),
+    ({'x-amz-decoded-content-length': 'many'}, None),
+    ({}, b'\xff;chunk-signature=0\r\n'),
+    ({}, b'-1;chunk-signature=0\r\n'),
+])
+def test_mockserver_chunked_malformed(extra, body):
+    server = make_server()
+    c = Credentials(KEY_ID, SECRET, 'us-east-1', 's3')
+    canon_request = make_request('PUT')
+    encoder = ChunkedEncoder(c, canon_request, [b'foo'], checksum=None)
+    signed_headers = encoder.sign_via_headers()
+    headers = dict(canon_request.headers)
+    for name, value in signed_headers:
+        headers[name.lower()] = value
+    headers.update(extra)
+    if body is None:
+        body = b''.join(encoder)
+    status, _, data = server.handle(
+        'PUT', target(canon_request), headers, body,
+    )
+    assert status == 400
+    assert data.startswith(b'<?xml')
+
+
+def test_mockserver_trailer_malformed():
+    server = make_server()
+    c = Credentials(KEY_ID, SECRET, 'us-east-1', 's3')
+    canon_request = make_request('PUT')
+    encoder = ChunkedEncoder(c, canon_request, [b'foo'])
+    signed_headers = encoder.sign_via_headers()
+    headers = dict(canon_request.headers)
+    for name, value in signed_headers:
+        headers[name.lower()] = value
+    body = b''.join(encoder)
+    body = body[:body.rindex(b'x-amz-checksum')] + b'\xff\r\n\r\n'
+    status, _, data = server.handle(
+        'PUT', target(canon_request), headers, body,
+    )
+    assert status == 400
+    assert b'<Code>IncompleteBody</Code>' in data
+
+
+def test_mockserver_non_ascii():
+    server = make_server()
+    c = Credentials(KEY_ID, SECRET, 'us-east-1', 's3')
+    canon_request = make_request('PUT')
+    canon_request.headers['x-foo'] = 'cafe'
+    headers = dict(canon_request.headers)
+    for name, value in c.sign_via_headers(canon_request):
+        headers[name.lower()] = value
+
+    status, _, data = server.handle(
+        'PUT', target(canon_request), dict(headers, **{'x-foo': 'café'}), b'',
+    )
+    assert status == 403
+    assert b'<Code>SignatureDoesNotMatch</Code>' in data
+
+    authorization = headers['authorization'].replace('/s3/', '/sé3/')
+    status, _, data = server.handle(
+        'PUT',
+        target(canon_request),
+        dict(headers, authorization=authorization),
+        b'',
+    )
+    assert status == 400
+    assert b'<Code>AuthorizationHeaderMalformed</Code>' in data
@@ -0,0 +1,118 @@
+import io
+import hashlib
+import pytest
+
+from johnhancock import (
+    CanonicalRequest, PayloadDigester, SpooledPayload, crc32c,
+)
+
+
+def test_crc32c():
+    assert crc32c(b'123456789') == 0xE3069283
+    assert crc32c(b'6789', crc32c(b'12345')) == 0xE3069283
+
+
+def test_payload_digester():
+    digester = PayloadDigester(['md5', 'crc32', 'crc32c'])
+    digester.update(b'f')
+    digester.update(b'oo')
+    assert digester.hexdigest('sha256') == (
+        '2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae'
+    )
+    assert digester.hexdigest('md5') == 'acbd18db4cc2f85cedef654fccc4a4d8'
+    assert digester.hexdigest('crc32') == '8c736521'
+    assert dict(digester.headers()) == {
+        'Content-MD5': 'rL0Y20zC+Fzt72VPzMSk2A==',
+        'X-Amz-Checksum-CRC32': 'jHNlIQ==',
+        'X-Amz-Checksum-CRC32C': 'z8SuHQ==',
+    }
+
+    with pytest.raises(ValueError):
+        PayloadDigester(['md4'])
+
+
+def test_payload_digester_from_file():
+    data = b'foo' * 1000
+    digester = PayloadDigester.from_file(
+        io.BytesIO(data), ['md5'], block_size=7,
+    )
+    expected = PayloadDigester(['md5'])
+    expected.update(data)
+    assert digester.headers() == expected.headers()
+    assert digester.digest('sha256') == expected.digest('sha256')
+
+
+def test_canon_request_payload_digester():
+    digester = PayloadDigester(['md5'])
+    digester.update(b'foo')
+    canon_request = CanonicalRequest(
+        'PUT',
+        'https://examplebucket.s3.amazonaws.com/foo',
+        payload=digester,
+    )
+    assert (
+        canon_request.hashed_payload ==
+        '2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae'
+    )
+    assert canon_request.headers['content-md5'] == 'rL0Y20zC+Fzt72VPzMSk2A=='
+
+
+def test_spooled_payload_in_memory():
+    with SpooledPayload(iter([b'fo', b'o']), algorithms=['md5']) as payload:
+        assert not payload.spilled
+        assert len(payload) == 3
+        assert payload.getbuffer() == b'foo'
+        f = payload.open()
+        assert f.read() == b'foo'
+        f.close()
+        assert payload.open().read() == b'foo'
+        assert b''.join(payload) == b'foo'
+
+        canon_request = CanonicalRequest('PUT', '/', payload=payload)
+        assert (
+            canon_request.hashed_payload ==
+            '2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae'
+        )
+        assert (
+            canon_request.headers['content-md5'] == 'rL0Y20zC+Fzt72VPzMSk2A=='
+        )
+
+
+def test_spooled_payload_spilled():
+    data = b'foo' * 1000
+    payload = SpooledPayload(io.BytesIO(data), threshold=100, block_size=64)
+    assert payload.spilled
+    assert len(payload) == 3000
+    assert payload.getbuffer() == data
+    assert all(isinstance(block, memoryview) for block in payload)
+    assert b''.join(payload) == data
+    assert payload.digester.digest('sha256') == hashlib.sha256(data).digest()
+
+    # Closing an opened file doesn't affect the payload.
+    f = payload.open()
+    assert f.read() == data
+    f.close()
+    assert payload.open().read() == data
+
+    # Opened files each keep their own position.
+    first, second = payload.open(), payload.open()
+    assert first.read(10) == data[:10]
+    assert second.read(100) == data[:100]
+    assert first.read(10) == data[10:20]
+    second.seek(-5, io.SEEK_END)
+    assert second.read() == data[-5:]
+    assert first.read() == data[20:]
+    first.close()
+    second.close()
+    payload.close()
+
+
+@pytest.mark.parametrize('threshold', [100, 10000])
+def test_spooled_payload_closed(threshold):
+    payload = SpooledPayload([b'foo' * 1000], threshold=threshold)
+    view = payload.getbuffer()
+    payload.close()
+    assert view[:3] == b'foo'
+    for method in [payload.open, payload.getbuffer, lambda: list(payload)]:
+        with pytest.raises(ValueError):
+            method()
@@ -0,0 +1,110 @@
+from datetime import datetime as DateTime
+
+from johnhancock import Credentials, CanonicalRequest, PresignedCache
+
+
+def make_request(path='/', now=DateTime(2015, 8, 30, 12, 36)):
+    canon_request = CanonicalRequest(
+        'GET',
+        path,
+        'Action=ListUsers&Version=2010-05-08',
+        {
+            'Host': 'iam.amazonaws.com',
+            'Content-Type': 'application/x-www-form-urlencoded; charset=utf-8',
+        },
+    )
+    canon_request._datetime = lambda: now
+    return canon_request
+
+
+def make_cache(now, **kwargs):
+    c = Credentials(
+        'AKIDEXAMPLE',
+        'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY',
+        'us-east-1',
+        'iam',
+    )
+    cache = PresignedCache(c, **kwargs)
+    cache._datetime = lambda: now[0]
+    return cache
+
+
+def test_presigned_cache_hit():
+    now = [DateTime(2015, 8, 30, 12, 36)]
+    cache = make_cache(now)
+    first = make_request()
+    params = cache.sign_via_query_string(first)
+    assert params[5] == (
+        'X-Amz-Signature',
+        '37ac2f4fde00b0ac9bd9eadeb459b1bbee224158d66e7ae5fcadb70b2d181d02',
+    )
+
+    now[0] = DateTime(2015, 8, 30, 12, 36, 20)
+    second = make_request(now=now[0])
+    assert cache.sign_via_query_string(second) == params
+    assert second.query == first.query
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate == 0.5
+
+
+def test_presigned_cache_expiry():
+    now = [DateTime(2015, 8, 30, 12, 36)]
+    cache = make_cache(now)
+    params = cache.sign_via_query_string(make_request())
+
+    # Less than half the lifetime remains, so the request is signed anew.
+    now[0] = DateTime(2015, 8, 30, 12, 36, 31)
+    resigned = cache.sign_via_query_string(make_request(now=now[0]))
+    assert resigned[2] == ('X-Amz-Date', '20150830T123631Z')
+    assert resigned != params
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    # A longer expiry is cached separately.
+    cache.sign_via_query_string(make_request(now=now[0]), expires=3600)
+    assert len(cache) == 2
+
+
+def test_presigned_cache_eviction():
+    now = [DateTime(2015, 8, 30, 12, 36)]
+    cache = make_cache(now, max_size=2)
+    cache.sign_via_query_string(make_request('/a'), expires=3600)
+    cache.sign_via_query_string(make_request('/b'), expires=60)
+    cache.sign_via_query_string(make_request('/c'), expires=3600)
+    assert len(cache) == 2
+    assert cache.evictions == 1
+
+    # The entry with the least lifetime remaining was dropped.
+    cache.sign_via_query_string(make_request('/a'), expires=3600)
+    cache.sign_via_query_string(make_request('/b'), expires=60)
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+def test_presigned_cache_clock_offset():
+    c = Credentials(
+        'AKIDEXAMPLE',
+        'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY',
+        'us-east-1',
+        'iam',
+    )
+    cache = PresignedCache(c)
+    # The local clock is an hour slow.
+    local = [DateTime(2015, 8, 30, 11, 36)]
+    c._signer._datetime = lambda: local[0]
+    c.correct_clock('Sun, 30 Aug 2015 12:36:00 GMT')
+
+    params = cache.sign_via_query_string(make_request(now=local[0]))
+    assert params[2] == ('X-Amz-Date', '20150830T123600Z')
+    assert params[5] == (
+        'X-Amz-Signature',
+        '37ac2f4fde00b0ac9bd9eadeb459b1bbee224158d66e7ae5fcadb70b2d181d02',
+    )
+
+    local[0] = DateTime(2015, 8, 30, 11, 36, 20)
+    assert cache.sign_via_query_string(make_request(now=local[0])) == params
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Thirty minutes later the signature has long expired.
+    local[0] = DateTime(2015, 8, 30, 12, 6)
+    params = cache.sign_via_query_string(make_request(now=local[0]))
+    assert params[2] == ('X-Amz-Date', '20150830T130600Z')
+    assert (cache.hits, cache.misses) == (1, 2)
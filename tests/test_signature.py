@@ -1,12 +1,26 @@
+import hmac
+import hashlib
+import pytest
 from datetime import datetime as DateTime, date as Date
 
+import johnhancock
 from johnhancock import (
     SigningKey, CanonicalRequest, CredentialScope, DatedCredentialScope,
-    generate_string_to_sign,
+    generate_string_to_sign, get_backend, set_default_backend,
 )
 
 
-def test_signing_key():
+@pytest.fixture(params=['hashlib', 'cryptography'])
+def backend(request):
+    if request.param == 'cryptography':
+        pytest.importorskip('cryptography')
+    default = johnhancock._default_backend
+    set_default_backend(request.param)
+    yield get_backend(request.param)
+    set_default_backend(default)
+
+
+def test_signing_key(backend):
     scope = DatedCredentialScope(
         'us-east-1',
         'iam',
@@ -22,7 +36,7 @@ def test_signing_key():
     ])
 
 
-def test_signing_key_sign():
+def test_signing_key_sign(backend):
     scope = DatedCredentialScope(
         'us-east-1',
         'iam',
@@ -44,7 +58,7 @@ def test_signing_key_sign():
     )
 
 
-def test_string_to_sign():
+def test_string_to_sign(backend):
     date = DateTime(2015, 8, 30, 12, 36)
     scope = CredentialScope(
         'us-east-1',
@@ -66,3 +80,20 @@ def test_string_to_sign():
         + '20150830/us-east-1/iam/aws4_request\n'
         + 'f536975d06c0309214f805bb90ccff089219ecd68b2577efef23edd43b7e1a59'
     )
+
+
+def test_signing_key_backend(backend):
+    key = SigningKey.from_key(b'k' * 32, backend)
+    assert key.sign('foo') == hmac.new(
+        b'k' * 32, b'foo', hashlib.sha256,
+    ).hexdigest()
+
+    # Keys longer than the block size are hashed first.
+    signer = backend.hmac_signer(b'k' * 100)
+    assert signer(b'foo') == backend.hmac(b'k' * 100, b'foo') == hmac.new(
+        b'k' * 100, b'foo', hashlib.sha256,
+    ).digest()
+
+    h = backend.sha256(b'f')
+    h.update(memoryview(b'oo'))
+    assert h.hexdigest() == hashlib.sha256(b'foo').hexdigest()
@@ -0,0 +1,94 @@
+from datetime import datetime as DateTime, date as Date
+
+from johnhancock import (
+    Signer, Credentials, CanonicalRequest, CredentialScope, SigningKey,
+    DatedCredentialScope,
+)
+
+
+SECRET = 'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY'
+
+
+def test_signer_sign_via_headers():
+    signer = Signer('AKIDEXAMPLE', SECRET)
+    canon_request = CanonicalRequest(
+        'GET',
+        '/',
+        'Action=ListUsers&Version=2010-05-08',
+        {
+            'Host': 'iam.amazonaws.com',
+            'Content-Type': 'application/x-www-form-urlencoded; charset=utf-8',
+            'X-Amz-Date': '20150830T123600Z',
+        },
+    )
+    headers = signer.sign_via_headers(canon_request, 'us-east-1', 'iam')
+    assert headers[0][1].endswith(
+        'Signature=5d672d79c15b13162d9279b0855cfba6789a8edb4c82c400e06b5924a'
+        + '6f2b5d7'
+    )
+
+
+def test_signer_key_cache():
+    signer = Signer('AKIDEXAMPLE', SECRET)
+    dt = DateTime(2015, 8, 30, 12, 36)
+    key = signer.signing_key(dt, 'us-east-1', 'iam')
+    assert key is signer.signing_key(
+        DateTime(2015, 8, 30, 23, 59), 'us-east-1', 'iam',
+    )
+    assert key is not signer.signing_key(dt, 'us-west-2', 'iam')
+    assert key.key == SigningKey(
+        SECRET, DatedCredentialScope('us-east-1', 'iam', dt),
+    ).key
+
+    # Credentials from the signer share its cache.
+    c = signer.credentials('us-east-1', 'iam')
+    assert isinstance(c, Credentials)
+    assert c._scope == CredentialScope('us-east-1', 'iam')
+    assert c.signing_key(dt) is key
+
+
+def test_signer_warm():
+    signer = Signer('AKIDEXAMPLE', SECRET)
+    signer._datetime = lambda: DateTime(2015, 8, 30, 23, 55)
+    signer.signing_key(Date(2015, 8, 29), 'us-east-1', 'iam')
+    signer.signing_key(Date(2015, 8, 30), 'us-east-1', 'iam')
+    signer.warm([CredentialScope('us-west-2', 's3')])
+    assert set(signer._keys) == {
+        ('20150830', 'us-east-1', 'iam'),
+        ('20150831', 'us-west-2', 's3'),
+    }
+
+    # By default, every scope seen is warmed.
+    signer.warm()
+    assert set(signer._keys) == {
+        ('20150830', 'us-east-1', 'iam'),
+        ('20150831', 'us-east-1', 'iam'),
+        ('20150831', 'us-west-2', 's3'),
+    }
+
+
+def test_signer_key_cache_pruned():
+    signer = Signer('AKIDEXAMPLE', SECRET)
+    for day in range(1, 31):
+        signer.signing_key(Date(2015, 8, day), 'us-east-1', 'iam')
+        signer.signing_key(Date(2015, 8, day), 'us-west-2', 's3')
+    assert set(signer._keys) == {
+        ('20150829', 'us-east-1', 'iam'),
+        ('20150829', 'us-west-2', 's3'),
+        ('20150830', 'us-east-1', 'iam'),
+        ('20150830', 'us-west-2', 's3'),
+    }
+
+    # Signing with an older date doesn't prune newer keys.
+    signer.signing_key(Date(2015, 8, 1), 'us-east-1', 'iam')
+    assert ('20150830', 'us-east-1', 'iam') in signer._keys
+
+
+def test_signer_warm_clock_offset():
+    signer = Signer('AKIDEXAMPLE', SECRET)
+    # The local clock is ten minutes slow, so it is already tomorrow.
+    signer._datetime = lambda: DateTime(2015, 8, 30, 23, 55)
+    signer.correct_clock(DateTime(2015, 8, 31, 0, 5))
+    assert signer.now() == DateTime(2015, 8, 31, 0, 5)
+    signer.warm([CredentialScope('us-east-1', 'iam')])
+    assert set(signer._keys) == {('20150901', 'us-east-1', 'iam')}